@@ -0,0 +1,146 @@
+"""
+Numeric kernels for the vehicle tracker
+Compiled with Numba when it is installed; otherwise the same functions run as
+plain NumPy broadcasting, so the tracker works without the JIT.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional
+    njit = None
+
+
+if njit is not None:
+
+    @njit(fastmath=True, cache=True)
+    def iou_matrix(boxes1, boxes2):
+        """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes"""
+        n = boxes1.shape[0]
+        m = boxes2.shape[0]
+        out = np.zeros((n, m))
+
+        for i in range(n):
+            ax1, ay1, ax2, ay2 = boxes1[i, 0], boxes1[i, 1], boxes1[i, 2], boxes1[i, 3]
+            area1 = (ax2 - ax1) * (ay2 - ay1)
+
+            for j in range(m):
+                bx1, by1, bx2, by2 = boxes2[j, 0], boxes2[j, 1], boxes2[j, 2], boxes2[j, 3]
+                w = min(ax2, bx2) - max(ax1, bx1)
+                h = min(ay2, by2) - max(ay1, by1)
+                if w <= 0.0 or h <= 0.0:
+                    continue
+
+                intersection = w * h
+                union = area1 + (bx2 - bx1) * (by2 - by1) - intersection
+                if union > 0.0:
+                    out[i, j] = intersection / union
+
+        return out
+
+    @njit(fastmath=True, cache=True)
+    def pairwise_distances(points1, points2):
+        """Euclidean distance between every row of (N, K) and (M, K) points"""
+        n = points1.shape[0]
+        m = points2.shape[0]
+        k = points1.shape[1]
+        out = np.empty((n, m))
+
+        for i in range(n):
+            for j in range(m):
+                acc = 0.0
+                for d in range(k):
+                    diff = points1[i, d] - points2[j, d]
+                    acc += diff * diff
+                out[i, j] = np.sqrt(acc)
+
+        return out
+
+    @njit(cache=True)
+    def greedy_assignment(cost, max_cost):
+        """Match cheapest pairs first, each row/column at most once, while cost < max_cost"""
+        n, m = cost.shape
+        order = np.argsort(cost.ravel(), kind='mergesort')
+        row_used = np.zeros(n, dtype=np.bool_)
+        col_used = np.zeros(m, dtype=np.bool_)
+        rows = np.empty(min(n, m), dtype=np.int64)
+        cols = np.empty(min(n, m), dtype=np.int64)
+        k = 0
+
+        for flat in order:
+            i = flat // m
+            j = flat % m
+            if not cost[i, j] < max_cost:
+                break
+            if row_used[i] or col_used[j]:
+                continue
+            row_used[i] = True
+            col_used[j] = True
+            rows[k] = i
+            cols[k] = j
+            k += 1
+            if k == rows.shape[0]:
+                break
+
+        return rows[:k], cols[:k]
+
+else:
+
+    def iou_matrix(boxes1, boxes2):
+        """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes"""
+        top_left = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+        bottom_right = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+        wh = np.clip(bottom_right - top_left, 0, None)
+        intersection = wh[..., 0] * wh[..., 1]
+
+        area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+        area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+        union = area1[:, None] + area2[None, :] - intersection
+
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+    def pairwise_distances(points1, points2):
+        """Euclidean distance between every row of (N, K) and (M, K) points"""
+        return np.linalg.norm(points1[:, None, :] - points2[None, :, :], axis=2)
+
+    def greedy_assignment(cost, max_cost):
+        """Match cheapest pairs first, each row/column at most once, while cost < max_cost"""
+        n, m = cost.shape
+        order = np.argsort(cost, axis=None, kind='stable')
+        row_used = np.zeros(n, dtype=bool)
+        col_used = np.zeros(m, dtype=bool)
+        rows, cols = [], []
+
+        for i, j in zip(*np.unravel_index(order, cost.shape)):
+            if not cost[i, j] < max_cost or len(rows) == min(n, m):
+                break
+            if row_used[i] or col_used[j]:
+                continue
+            row_used[i] = col_used[j] = True
+            rows.append(i)
+            cols.append(j)
+
+        return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+
+def is_unique_optimum(cost, rows, cols):
+    """True if the matching covers the smaller side of `cost` and every pair is the
+    strict minimum of its row and its column, i.e. it is the only minimum-cost assignment"""
+    if len(rows) != min(cost.shape):
+        return False
+    picked = cost[rows, cols]
+    others = cost.copy()
+    others[rows, cols] = np.inf
+    return bool(
+        np.all(picked < others[rows].min(axis=1, initial=np.inf)) and
+        np.all(picked < others[:, cols].min(axis=0, initial=np.inf))
+    )
+
+
+def warmup_kernels():
+    """Trigger JIT compilation so the first real frame doesn't pay for it"""
+    boxes = np.array([[0.0, 0.0, 1.0, 1.0]])
+    iou_matrix(boxes, boxes)
+    pairwise_distances(boxes[:, :2], boxes[:, :2])
+    greedy_assignment(np.zeros((1, 1)), 1.0)
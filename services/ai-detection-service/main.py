@@ -16,19 +16,28 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Tuple
 import cv2
 import numpy as np
+import torch
 from ultralytics import YOLO
 from google.cloud import storage, pubsub_v1
 import psycopg2
 from psycopg2 import pool
 from psycopg2.extras import RealDictCursor
+import asyncio
 import json
 import os
+import queue
+import shutil
+import threading
 from datetime import datetime
 import logging
 from contextlib import contextmanager
-from scipy.spatial.distance import euclidean
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import pdist
 from scipy.optimize import linear_sum_assignment
-from collections import defaultdict, deque
+from collections import Counter
+from itertools import islice
+
+from kernels import greedy_assignment, iou_matrix, is_unique_optimum, pairwise_distances, warmup_kernels
 
 logging.basicConfig(
     level=logging.INFO,
@@ -37,34 +46,104 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class RingBuffer:
+    """Fixed-capacity ndarray history; once full, new rows overwrite the oldest"""
+    
+    def __init__(self, capacity: int, width: int = 0, dtype=np.float32):
+        shape = (capacity, width) if width else (capacity,)
+        self._data = np.empty(shape, dtype=dtype)
+        self._capacity = capacity
+        self._count = 0  # total rows ever appended
+        
+    def __len__(self) -> int:
+        return min(self._count, self._capacity)
+    
+    def __getitem__(self, index: int):
+        size = len(self)
+        if not -size <= index < size:
+            raise IndexError('RingBuffer index out of range')
+        if index < 0:
+            index += size
+        return self._data[(self._count - size + index) % self._capacity]
+    
+    def append(self, value):
+        self._data[self._count % self._capacity] = value
+        self._count += 1
+        
+    def tail(self, k: int) -> np.ndarray:
+        """Last k rows, oldest first (a view unless the window wraps around)"""
+        k = min(k, len(self))
+        end = self._count % self._capacity
+        start = end - k
+        if start >= 0:
+            return self._data[start:end]
+        return np.concatenate((self._data[start:], self._data[:end]))
+
+
+class FrameDetections:
+    """One frame's vehicle detections as parallel arrays (row i is detection i)"""
+    
+    __slots__ = ('positions', 'bboxes', 'xyxy', 'confidences', 'class_ids', 'class_names')
+    
+    def __init__(
+        self,
+        boxes: np.ndarray,
+        confidences: np.ndarray,
+        class_ids: np.ndarray,
+        class_names: List[str]
+    ):
+        # Image-space xyxy in; y is negated so that "up" is positive
+        x, y, x2, y2 = boxes.T
+        width = x2 - x
+        height = y2 - y
+        
+        self.positions = np.stack(((x + x2) / 2, -((y + y2) / 2)), axis=1)
+        self.bboxes = np.stack((x, -y2, width, height), axis=1)
+        self.xyxy = np.stack((x, -y2, x + width, -y2 + height), axis=1).astype(np.float64)
+        self.confidences = confidences
+        self.class_ids = class_ids.astype(np.int64)
+        self.class_names = class_names
+        
+    def __len__(self) -> int:
+        return len(self.confidences)
+
+
 class Track:
     """Individual vehicle track with history"""
     
-    def __init__(self, track_id: int, detection: Dict, frame_idx: int):
+    def __init__(self, track_id: int, detections: FrameDetections, index: int, frame_idx: int):
         self.track_id = track_id
-        self.class_name = detection['class']
-        self.positions = deque(maxlen=30)
-        self.frames = deque(maxlen=30)
-        self.confidences = deque(maxlen=30)
-        self.bboxes = deque(maxlen=30)
-        self.velocities = deque(maxlen=29)
-        self.accelerations = deque(maxlen=28)
-        
-        self.positions.append((detection['x'], detection['y']))
+        self.class_name = detections.class_names[index]
+        self.class_id = int(detections.class_ids[index])
+        self.positions = RingBuffer(30, width=2)
+        self.frames = RingBuffer(30, dtype=np.int64)
+        self.confidences = RingBuffer(30)
+        self.bboxes = RingBuffer(30, width=4)
+        self.velocities = RingBuffer(29)
+        self.accelerations = RingBuffer(28)
+        
+        self.positions.append(detections.positions[index])
         self.frames.append(frame_idx)
-        self.confidences.append(detection['confidence'])
-        self.bboxes.append(detection['bbox'])
+        self.confidences.append(detections.confidences[index])
+        self.bboxes.append(detections.bboxes[index])
+        self._set_box(detections.xyxy[index])
         
         self.age = 0
         self.time_since_update = 0
         self.hits = 1
         self.hit_streak = 1
         
-    def update(self, detection: Dict, frame_idx: int):
-        self.positions.append((detection['x'], detection['y']))
+    def _set_box(self, xyxy: np.ndarray):
+        # Latest box in xyxy form, stacked directly by the IoU kernels
+        self.xyxy = xyxy
+        self._prediction = None
+        
+    def update(self, detections: FrameDetections, index: int, frame_idx: int):
+        self.positions.append(detections.positions[index])
         self.frames.append(frame_idx)
-        self.confidences.append(detection['confidence'])
-        self.bboxes.append(detection['bbox'])
+        self.confidences.append(detections.confidences[index])
+        self.bboxes.append(detections.bboxes[index])
+        self._set_box(detections.xyxy[index])
         
         if len(self.positions) >= 2:
             frame_diff = self.frames[-1] - self.frames[-2]
@@ -84,23 +163,23 @@ class Track:
         self.time_since_update = 0
         
     def predict(self, frame_idx: int) -> Tuple[float, float]:
-        if len(self.positions) < 2:
-            return self.positions[-1]
+        if self._prediction is not None and self._prediction[0] == frame_idx:
+            return self._prediction[1]
         
-        recent_positions = list(self.positions)[-3:]
-        recent_frames = list(self.frames)[-3:]
-        
-        if len(recent_positions) >= 2:
-            dx = recent_positions[-1][0] - recent_positions[-2][0]
-            dy = recent_positions[-1][1] - recent_positions[-2][1]
-            frame_diff = frame_idx - recent_frames[-1]
-            
-            pred_x = recent_positions[-1][0] + dx * frame_diff
-            pred_y = recent_positions[-1][1] + dy * frame_diff
+        if len(self.positions) < 2:
+            prediction = tuple(self.positions[-1])
+        else:
+            last_x, last_y = self.positions[-1]
+            prev_x, prev_y = self.positions[-2]
+            frame_diff = frame_idx - self.frames[-1]
             
-            return (pred_x, pred_y)
+            prediction = (
+                last_x + (last_x - prev_x) * frame_diff,
+                last_y + (last_y - prev_y) * frame_diff
+            )
         
-        return self.positions[-1]
+        self._prediction = (frame_idx, prediction)
+        return prediction
     
     def get_current_velocity(self) -> float:
         if len(self.velocities) == 0:
@@ -117,6 +196,17 @@ class OptimizedVehicleTracker:
     """Optimized tracker with better sensitivity for real accidents"""
     
     VEHICLE_CLASSES = ['car', 'truck', 'bus', 'motorcycle', 'bicycle']
+    # UPDATED WEIGHTS - erratic trajectory more important
+    INDICATOR_WEIGHTS = {
+        'collision': 1.0,
+        'sudden_stop': 0.8,  # INCREASED from 0.7
+        'erratic_trajectory': 0.75,  # INCREASED from 0.6
+        'vehicle_clustering': 0.6  # INCREASED from 0.5
+    }
+    DENSE_PAIR_LIMIT = 64  # Up to this many detections a full pdist beats building a KD-tree
+    # Up to this many tracks/detections try greedy matching first (0 = always Hungarian);
+    # its pairs are only kept when they are provably the Hungarian result
+    GREEDY_MATCH_LIMIT = int(os.getenv('AI_GREEDY_MATCH_LIMIT', 20))
     
     def __init__(
         self,
@@ -142,7 +232,11 @@ class OptimizedVehicleTracker:
         
         self.tracks = []
         self.next_track_id = 0
-        self.frame_detections = defaultdict(list)
+        self.frame_detections: Dict[int, FrameDetections] = {}
+        # Reused (tracks, 4, 2) window for the erratic-trajectory angles; grows on demand
+        self._scratch_positions = np.empty((256, 4, 2), dtype=np.float32)
+        # Vehicle flag per class id (-1 = not seen yet), filled in from the names as ids show up
+        self._vehicle_lut = np.full(0, -1, dtype=np.int8)
         
     def calculate_iou(self, bbox1: Tuple, bbox2: Tuple) -> float:
         x1, y1, w1, h1 = bbox1
@@ -166,36 +260,58 @@ class OptimizedVehicleTracker:
         
         return intersection / union if union > 0 else 0.0
     
+    def calculate_iou_matrix(self, boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+        """Pairwise IoU between two (N, 4) / (M, 4) arrays of xyxy boxes"""
+        return iou_matrix(boxes1, boxes2)
+    
     def calculate_cost_matrix(
         self,
         tracks: List[Track],
-        detections: List[Dict],
+        detections: FrameDetections,
         frame_idx: int
     ) -> np.ndarray:
         if len(tracks) == 0 or len(detections) == 0:
             return np.array([])
         
-        cost_matrix = np.zeros((len(tracks), len(detections)))
+        predicted = np.array([t.predict(frame_idx) for t in tracks], dtype=np.float64)
+        position_dist = pairwise_distances(predicted, detections.positions.astype(np.float64))
         
-        for i, track in enumerate(tracks):
-            predicted_pos = track.predict(frame_idx)
-            
-            for j, detection in enumerate(detections):
-                det_pos = (detection['x'], detection['y'])
-                position_dist = euclidean(predicted_pos, det_pos)
-                iou = self.calculate_iou(track.bboxes[-1], detection['bbox'])
-                iou_cost = 1.0 - iou
-                class_match = 1.0 if track.class_name == detection['class'] else 2.0
-                
-                cost = (
-                    0.5 * (position_dist / self.max_tracking_distance) +
-                    0.3 * iou_cost +
-                    0.2 * class_match
-                )
-                
-                cost_matrix[i, j] = cost
+        track_boxes = np.stack([t.xyxy for t in tracks])
+        iou_cost = 1.0 - self.calculate_iou_matrix(track_boxes, detections.xyxy)
+        
+        track_classes = np.array([t.class_id for t in tracks], dtype=np.int64)
+        class_match = np.where(
+            track_classes[:, None] == detections.class_ids[None, :], 1.0, 2.0
+        )
+        
+        return (
+            0.5 * (position_dist / self.max_tracking_distance) +
+            0.3 * iou_cost +
+            0.2 * class_match
+        )
+    
+    def _vehicle_mask(self, class_ids: np.ndarray, class_names: List[str]) -> np.ndarray:
+        """Vehicle flag per box, looked up by class id; names are only checked on a new id"""
+        lut = self._vehicle_lut
+        if len(class_ids) and class_ids.max() >= len(lut):
+            grown = np.full(class_ids.max() + 1, -1, dtype=np.int8)
+            grown[:len(lut)] = lut
+            self._vehicle_lut = lut = grown
         
-        return cost_matrix
+        flags = lut[class_ids]
+        for i in np.flatnonzero(flags < 0):
+            flags[i] = lut[class_ids[i]] = class_names[i] in self.VEHICLE_CLASSES
+        return flags == 1
+    
+    def assign(self, cost_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Minimum-cost track/detection assignment (same pairs as linear_sum_assignment)"""
+        if max(cost_matrix.shape) <= self.GREEDY_MATCH_LIMIT:
+            # Few vehicles: cheapest-first matching usually lands on the unique optimum,
+            # which is cheap to confirm; anything else goes to Hungarian
+            rows, cols = greedy_assignment(cost_matrix, np.inf)
+            if is_unique_optimum(cost_matrix, rows, cols):
+                return rows, cols
+        return linear_sum_assignment(cost_matrix)
     
     def process_frame(
         self,
@@ -205,26 +321,14 @@ class OptimizedVehicleTracker:
         class_names: List[str],
         frame_idx: int
     ) -> List[Track]:
-        detections = []
-        for i, (box, conf, class_name) in enumerate(zip(boxes, confidences, class_names)):
-            if class_name not in self.VEHICLE_CLASSES:
-                continue
-            if conf < self.confidence_threshold:
-                continue
-            
-            x, y, x2, y2 = box
-            center_x = (x + x2) / 2
-            center_y = (y + y2) / 2
-            
-            detections.append({
-                'x': center_x,
-                'y': -center_y,
-                'width': x2 - x,
-                'height': y2 - y,
-                'bbox': (x, -y2, x2 - x, y2 - y),
-                'confidence': conf,
-                'class': class_name
-            })
+        class_ids = np.asarray(class_ids).astype(np.int64, copy=False)
+        keep = self._vehicle_mask(class_ids, class_names) & (confidences >= self.confidence_threshold)
+        detections = FrameDetections(
+            boxes[keep],
+            confidences[keep],
+            class_ids[keep],
+            [class_names[i] for i in np.flatnonzero(keep)]
+        )
         
         self.frame_detections[frame_idx] = detections
         
@@ -233,14 +337,14 @@ class OptimizedVehicleTracker:
         
         if len(self.tracks) > 0 and len(detections) > 0:
             cost_matrix = self.calculate_cost_matrix(self.tracks, detections, frame_idx)
-            track_indices, detection_indices = linear_sum_assignment(cost_matrix)
+            track_indices, detection_indices = self.assign(cost_matrix)
             
             matched_tracks = set()
             matched_detections = set()
             
             for track_idx, det_idx in zip(track_indices, detection_indices):
                 if cost_matrix[track_idx, det_idx] < 0.6:  # INCREASED from 0.5
-                    self.tracks[track_idx].update(detections[det_idx], frame_idx)
+                    self.tracks[track_idx].update(detections, det_idx, frame_idx)
                     matched_tracks.add(track_idx)
                     matched_detections.add(det_idx)
             
@@ -250,13 +354,13 @@ class OptimizedVehicleTracker:
             
             for det_idx in range(len(detections)):
                 if det_idx not in matched_detections:
-                    new_track = Track(self.next_track_id, detections[det_idx], frame_idx)
+                    new_track = Track(self.next_track_id, detections, det_idx, frame_idx)
                     self.tracks.append(new_track)
                     self.next_track_id += 1
         
         elif len(detections) > 0:
-            for detection in detections:
-                new_track = Track(self.next_track_id, detection, frame_idx)
+            for det_idx in range(len(detections)):
+                new_track = Track(self.next_track_id, detections, det_idx, frame_idx)
                 self.tracks.append(new_track)
                 self.next_track_id += 1
         
@@ -271,66 +375,84 @@ class OptimizedVehicleTracker:
         collisions = []
         active_tracks = [t for t in self.tracks if t.time_since_update == 0]
         
-        for i in range(len(active_tracks)):
-            for j in range(i + 1, len(active_tracks)):
-                track1 = active_tracks[i]
-                track2 = active_tracks[j]
-                iou = self.calculate_iou(track1.bboxes[-1], track2.bboxes[-1])
-                
-                if iou > self.collision_iou_threshold:  # 0.05 - very sensitive
-                    collisions.append({
-                        'type': 'collision',
-                        'frame': frame_idx,
-                        'track_ids': [track1.track_id, track2.track_id],
-                        'vehicle_classes': [track1.class_name, track2.class_name],
-                        'iou': iou,
-                        'confidence': min(0.95, 0.6 + iou * 0.7)  # HIGHER confidence
-                    })
+        if len(active_tracks) < 2:
+            return collisions
+        
+        boxes = np.stack([t.xyxy for t in active_tracks])
+        iou_matrix = self.calculate_iou_matrix(boxes, boxes)
+        
+        # Upper triangle only: each unordered pair once, in the same (i, j) order as before
+        pairs = np.argwhere(np.triu(iou_matrix > self.collision_iou_threshold, k=1))  # 0.05 - very sensitive
+        
+        for i, j in pairs:
+            track1 = active_tracks[i]
+            track2 = active_tracks[j]
+            iou = float(iou_matrix[i, j])
+            collisions.append({
+                'type': 'collision',
+                'frame': frame_idx,
+                'track_ids': [track1.track_id, track2.track_id],
+                'vehicle_classes': [track1.class_name, track2.class_name],
+                'iou': iou,
+                'confidence': min(0.95, 0.6 + iou * 0.7)  # HIGHER confidence
+            })
         
         return collisions
     
     def detect_sudden_stops(self, frame_idx: int) -> List[Dict]:
         sudden_stops = []
         
-        for track in self.tracks:
-            if len(track.velocities) < 2:
-                continue
-            
-            recent_velocities = list(track.velocities)[-3:]
-            if len(recent_velocities) >= 2:
-                velocity_change = recent_velocities[-1] - recent_velocities[0]
-                
-                if velocity_change < self.sudden_stop_threshold:  # -10.0
-                    if track.get_current_velocity() < 8.0:  # INCREASED from 5.0
-                        sudden_stops.append({
-                            'type': 'sudden_stop',
-                            'frame': frame_idx,
-                            'track_id': track.track_id,
-                            'vehicle_class': track.class_name,
-                            'velocity_change': velocity_change,
-                            'confidence': min(0.90, 0.65 + abs(velocity_change) / 40.0)  # HIGHER
-                        })
+        candidates = [t for t in self.tracks if len(t.velocities) >= 2]
+        if not candidates:
+            return sudden_stops
+        
+        # Oldest and newest of the last (up to) three velocities of every candidate
+        ends = np.array(
+            [(t.velocities[-min(3, len(t.velocities))], t.velocities[-1]) for t in candidates],
+            dtype=np.float32
+        )
+        velocity_changes = ends[:, 1] - ends[:, 0]
+        
+        # -10.0 threshold; stopped below 8.0 (INCREASED from 5.0)
+        flagged = (velocity_changes < self.sudden_stop_threshold) & (ends[:, 1] < 8.0)
+        
+        for i in np.flatnonzero(flagged):
+            track = candidates[i]
+            velocity_change = velocity_changes[i]
+            sudden_stops.append({
+                'type': 'sudden_stop',
+                'frame': frame_idx,
+                'track_id': track.track_id,
+                'vehicle_class': track.class_name,
+                'velocity_change': velocity_change,
+                'confidence': min(0.90, 0.65 + abs(velocity_change) / 40.0)  # HIGHER
+            })
         
         return sudden_stops
     
     def detect_vehicle_clustering(self, frame_idx: int) -> List[Dict]:
         clusters = []
-        detections = self.frame_detections.get(frame_idx, [])
+        detections = self.frame_detections.get(frame_idx)
         
-        if len(detections) < 3:
+        if detections is None or len(detections) < 3:
             return clusters
         
-        positions = np.array([(d['x'], d['y']) for d in detections])
-        close_pairs = 0
-        involved_vehicles = set()
+        positions = detections.positions.astype(np.float64)
         
-        for i in range(len(positions)):
-            for j in range(i + 1, len(positions)):
-                dist = euclidean(positions[i], positions[j])
-                if dist < self.clustering_distance:  # 80.0
-                    close_pairs += 1
-                    involved_vehicles.add(i)
-                    involved_vehicles.add(j)
+        if len(positions) <= self.DENSE_PAIR_LIMIT:
+            # One condensed distance vector; its order matches triu_indices(k=1).
+            # Only the threshold matters here, so compare squared distances and skip the sqrt
+            close = pdist(positions, 'sqeuclidean') < self.clustering_distance ** 2  # 80.0
+            rows, cols = np.triu_indices(len(positions), k=1)
+            pairs = np.stack((rows[close], cols[close]), axis=1)
+        else:
+            # KD-tree range query only visits nearby vehicles instead of every pair.
+            # query_pairs is inclusive, so shave one ulp off to keep the strict `<`.
+            radius = np.nextafter(self.clustering_distance, 0)
+            pairs = cKDTree(positions).query_pairs(radius, output_type='ndarray')
+        
+        close_pairs = len(pairs)
+        involved_vehicles = np.unique(pairs)
         
         if close_pairs >= 2 and len(involved_vehicles) >= 3:
             clusters.append({
@@ -346,92 +468,113 @@ class OptimizedVehicleTracker:
     def detect_erratic_trajectories(self, frame_idx: int) -> List[Dict]:
         erratic = []
         
-        for track in self.tracks:
-            if len(track.positions) < 4:  # LOWERED from 5
-                continue
-            
-            recent_positions = np.array(list(track.positions)[-4:])
-            
-            if len(recent_positions) >= 3:
-                vectors = np.diff(recent_positions, axis=0)
-                angles = []
-                
-                for i in range(len(vectors) - 1):
-                    v1 = vectors[i]
-                    v2 = vectors[i + 1]
-                    cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2) + 1e-6)
-                    angle = np.arccos(np.clip(cos_angle, -1.0, 1.0))
-                    angles.append(np.degrees(angle))
-                
-                if len(angles) > 0:
-                    avg_angle_change = np.mean(angles)
-                    max_angle_change = np.max(angles)
-                    
-                    # LOWERED thresholds: 60 and 35 (was 90 and 45)
-                    if max_angle_change > self.erratic_angle_threshold or avg_angle_change > 35:
-                        erratic.append({
-                            'type': 'erratic_trajectory',
-                            'frame': frame_idx,
-                            'track_id': track.track_id,
-                            'vehicle_class': track.class_name,
-                            'max_angle_change': max_angle_change,
-                            'avg_angle_change': avg_angle_change,
-                            'confidence': min(0.85, 0.5 + max_angle_change / 150.0)  # HIGHER
-                        })
+        candidates = [t for t in self.tracks if len(t.positions) >= 4]  # LOWERED from 5
+        if not candidates:
+            return erratic
+        
+        # Last four positions of every candidate, stacked into reused scratch space
+        if len(candidates) > len(self._scratch_positions):
+            self._scratch_positions = np.empty(
+                (2 * len(candidates), 4, 2), dtype=self._scratch_positions.dtype
+            )
+        recent_positions = self._scratch_positions[:len(candidates)]
+        for i, track in enumerate(candidates):
+            recent_positions[i] = track.positions.tail(4)
+        
+        # Turning angle between consecutive steps, all tracks at once
+        vectors = np.diff(recent_positions, axis=1)
+        v1 = vectors[:, :-1]
+        v2 = vectors[:, 1:]
+        dot = np.einsum('nij,nij->ni', v1, v2)
+        norms = np.linalg.norm(v1, axis=2) * np.linalg.norm(v2, axis=2)
+        angles = np.degrees(np.arccos(np.clip(dot / (norms + 1e-6), -1.0, 1.0)))
+        
+        avg_angle_changes = np.mean(angles, axis=1)
+        max_angle_changes = np.max(angles, axis=1)
+        
+        # LOWERED thresholds: 60 and 35 (was 90 and 45)
+        flagged = (max_angle_changes > self.erratic_angle_threshold) | (avg_angle_changes > 35)
+        
+        for i in np.flatnonzero(flagged):
+            track = candidates[i]
+            max_angle_change = max_angle_changes[i]
+            erratic.append({
+                'type': 'erratic_trajectory',
+                'frame': frame_idx,
+                'track_id': track.track_id,
+                'vehicle_class': track.class_name,
+                'max_angle_change': max_angle_change,
+                'avg_angle_change': avg_angle_changes[i],
+                'confidence': min(0.85, 0.5 + max_angle_change / 150.0)  # HIGHER
+            })
         
         return erratic
     
+    def _weighted_confidences(self, indicators: List[Dict]) -> List[float]:
+        return [ind['confidence'] * self.INDICATOR_WEIGHTS.get(ind['type'], 0.5) for ind in indicators]
+    
     def detect_accidents(self) -> Dict:
         all_indicators = []
+        weighted_confidences = []  # parallel to all_indicators
+        indicator_counts = Counter()
+        cluster_count = 0
         suspicious_frames = set()
+        frame_indices = sorted(self.frame_detections.keys())
         
-        for frame_idx in sorted(self.frame_detections.keys()):
-            collisions = self.detect_collisions(frame_idx)
-            all_indicators.extend(collisions)
-            for c in collisions:
-                suspicious_frames.add(frame_idx)
+        if frame_indices:
+            # Collision, sudden-stop and erratic checks only read the tracks' current
+            # state, so they yield the same indicators for every frame apart from the
+            # 'frame' label: run them once and restamp, scanning self.tracks once
+            first_frame = frame_indices[0]
+            collisions = self.detect_collisions(first_frame)
+            sudden_stops = self.detect_sudden_stops(first_frame)
+            erratic = self.detect_erratic_trajectories(first_frame)
+            track_based = bool(collisions or sudden_stops or erratic)
             
-            sudden_stops = self.detect_sudden_stops(frame_idx)
-            all_indicators.extend(sudden_stops)
-            for s in sudden_stops:
-                suspicious_frames.add(frame_idx)
+            # Track-based weights repeat every frame, so weigh them once up front
+            track_weights = [self._weighted_confidences(x) for x in (collisions, sudden_stops)]
+            erratic_weights = self._weighted_confidences(erratic)
             
-            clusters = self.detect_vehicle_clustering(frame_idx)
-            all_indicators.extend(clusters)
-            for cl in clusters:
-                suspicious_frames.add(frame_idx)
+            for frame_idx in frame_indices:
+                clusters = self.detect_vehicle_clustering(frame_idx)
+                
+                all_indicators.extend(dict(c, frame=frame_idx) for c in collisions)
+                all_indicators.extend(dict(s, frame=frame_idx) for s in sudden_stops)
+                all_indicators.extend(clusters)
+                all_indicators.extend(dict(e, frame=frame_idx) for e in erratic)
+                
+                for weights in track_weights:
+                    weighted_confidences.extend(weights)
+                weighted_confidences.extend(self._weighted_confidences(clusters))
+                weighted_confidences.extend(erratic_weights)
+                cluster_count += len(clusters)
+                if frame_idx == first_frame:
+                    clusters_on_first_frame = bool(clusters)
+                
+                if track_based or clusters:
+                    suspicious_frames.add(frame_idx)
             
-            erratic = self.detect_erratic_trajectories(frame_idx)
-            all_indicators.extend(erratic)
-            for e in erratic:
-                suspicious_frames.add(frame_idx)
+            # Keys in first-appearance order, as a Counter over all_indicators would give:
+            # track-based kinds fire on the first frame, clusters may only start later
+            repeats = len(frame_indices)
+            counts = [('collision', len(collisions) * repeats), ('sudden_stop', len(sudden_stops) * repeats)]
+            erratic_count = ('erratic_trajectory', len(erratic) * repeats)
+            if clusters_on_first_frame:
+                counts += [('vehicle_clustering', cluster_count), erratic_count]
+            else:
+                counts += [erratic_count, ('vehicle_clustering', cluster_count)]
+            indicator_counts = Counter({kind: count for kind, count in counts if count})
         
         total_frames = len(self.frame_detections)
         accident_frame_ratio = len(suspicious_frames) / total_frames if total_frames > 0 else 0
         
-        # UPDATED WEIGHTS - erratic trajectory more important
-        indicator_weights = {
-            'collision': 1.0,
-            'sudden_stop': 0.8,  # INCREASED from 0.7
-            'erratic_trajectory': 0.75,  # INCREASED from 0.6
-            'vehicle_clustering': 0.6  # INCREASED from 0.5
-        }
-        
-        if all_indicators:
-            weighted_confidences = [
-                ind['confidence'] * indicator_weights.get(ind['type'], 0.5)
-                for ind in all_indicators
-            ]
+        if weighted_confidences:
             max_confidence = max(weighted_confidences)
             avg_confidence = np.mean(weighted_confidences)
             final_confidence = 0.6 * max_confidence + 0.4 * avg_confidence  # More weight to avg
         else:
             final_confidence = 0.0
         
-        indicator_counts = defaultdict(int)
-        for ind in all_indicators:
-            indicator_counts[ind['type']] += 1
-        
         # IMPROVED DECISION LOGIC
         has_accident = (
             final_confidence > 0.50 or  # LOWERED from 0.65
@@ -450,7 +593,7 @@ class OptimizedVehicleTracker:
             'accident_indicators': all_indicators,
             'indicator_counts': dict(indicator_counts),
             'confirmed_tracks': len([t for t in self.tracks if t.hits >= self.min_hits]),
-            'total_detections': sum(len(dets) for dets in self.frame_detections.values())
+            'total_detections': sum(map(len, self.frame_detections.values()))
         }
     
     def get_statistics(self) -> Dict:
@@ -460,15 +603,11 @@ class OptimizedVehicleTracker:
             'total_tracks': len(self.tracks),
             'confirmed_tracks': len(confirmed_tracks),
             'total_frames': len(self.frame_detections),
-            'total_detections': sum(len(dets) for dets in self.frame_detections.values()),
+            'total_detections': sum(map(len, self.frame_detections.values())),
             'avg_track_length': np.mean([len(t.positions) for t in confirmed_tracks]) if confirmed_tracks else 0,
-            'vehicle_class_distribution': {}
+            'vehicle_class_distribution': dict(Counter(t.class_name for t in confirmed_tracks))
         }
         
-        for track in confirmed_tracks:
-            stats['vehicle_class_distribution'][track.class_name] = \
-                stats['vehicle_class_distribution'].get(track.class_name, 0) + 1
-        
         return stats
 
 
@@ -488,50 +627,426 @@ class Config:
     MODEL_CONFIDENCE = float(os.getenv('AI_CONFIDENCE_THRESHOLD', 0.35))
     FRAME_INTERVAL = float(os.getenv('AI_FRAME_INTERVAL', 0.5))  # 0.5 second!
     MAX_FRAMES = int(os.getenv('AI_MAX_FRAMES', 500))  # More frames
+    BATCH_SIZE = int(os.getenv('AI_BATCH_SIZE', 16))  # Frames per YOLO forward pass
+    # Opt-in: building the engine needs onnx/onnxslim/tensorrt, which aren't in requirements.txt
+    USE_TENSORRT = os.getenv('AI_USE_TENSORRT', 'false').lower() == 'true'
+    ENGINE_PATH = os.getenv('AI_ENGINE_PATH', '')  # Default: next to the .pt file, keyed by batch/imgsz/precision
+    ENGINE_PRECISION = os.getenv('AI_ENGINE_PRECISION', 'fp16').lower()  # fp16 | int8 (needs calibration data)
+    INT8_CALIBRATION_DATA = os.getenv('AI_INT8_DATA', '')  # Dataset YAML of traffic frames; required for int8
+    USE_OPENVINO = os.getenv('AI_USE_OPENVINO', 'true').lower() == 'true'  # CPU-only hosts
+    OPENVINO_PATH = os.getenv('AI_OPENVINO_PATH', '')  # Default: <model>-b<batch>-<imgsz>-fp32_openvino_model/
+    IMAGE_SIZE = int(os.getenv('AI_IMAGE_SIZE', 640))
+    HW_DECODE = os.getenv('AI_HW_DECODE', 'false').lower() == 'true'  # FFmpeg hardware decoding
+    # Seek instead of decoding through when samples are this many frames apart
+    # (x264's default keyframe interval; 0 disables seeking)
+    SEEK_MIN_FRAMES = int(os.getenv('AI_SEEK_MIN_FRAMES', 250))
+    # Downscale decoded frames so their longer side is at most this (0 = off)
+    FRAME_MAX_SIDE = int(os.getenv('AI_FRAME_MAX_SIDE', 0))
+    # Skip YOLO on frames within this dHash Hamming distance of the last inferred one (0 = off)
+    DEDUPE_MAX_DISTANCE = int(os.getenv('AI_DEDUPE_MAX_DISTANCE', 0))
+    WARMUP_RUNS = int(os.getenv('AI_WARMUP_RUNS', 3))
+    KEEP_WARM_SECONDS = float(os.getenv('AI_KEEP_WARM_SECONDS', 0))  # Idle heartbeat period (0 = off)
+    TORCH_COMPILE = os.getenv('AI_TORCH_COMPILE', 'false').lower() == 'true'  # PyTorch weights only
 
 config = Config()
 
+# FP16 on GPU; the CPU path stays FP32
+USE_HALF = torch.cuda.is_available()
+
+if USE_HALF:
+    # Video frames letterbox to the same input shape every batch, so cuDNN's
+    # one-off autotune on the first shape pays off for the rest of the run
+    torch.backends.cudnn.benchmark = True
+
+
+def remove_export(export_path: str):
+    """Delete a cached export (engine file or OpenVINO directory)"""
+    if os.path.isdir(export_path):
+        shutil.rmtree(export_path, ignore_errors=True)
+    elif os.path.exists(export_path):
+        os.remove(export_path)
+
+
+def open_exported(export_path: str, label: str) -> Optional[YOLO]:
+    """Load an export and run one dummy prediction, so a stale or truncated
+    file fails here (None) rather than on the first real batch"""
+    try:
+        exported = YOLO(export_path, task='detect')
+        exported.predict(
+            np.zeros((config.IMAGE_SIZE, config.IMAGE_SIZE, 3), dtype=np.uint8),
+            half=USE_HALF, verbose=False
+        )
+        return exported
+    except Exception as e:
+        logger.warning(f"⚠️ Cached {label} unusable, removing it: {e}")
+        remove_export(export_path)
+        return None
+
+
+def load_exported(model_path: str, export_path: str, label: str, **export_args) -> Optional[YOLO]:
+    """Load a cached export of the .pt weights, exporting it on first use (or when
+    the cached one no longer loads); None if that fails"""
+    if os.path.exists(export_path):
+        exported = open_exported(export_path, label)
+        if exported is not None:
+            return exported
+    
+    try:
+        logger.info(f"⚙️ Exporting {label} (one-off): {export_path}")
+        exported = YOLO(model_path).export(imgsz=config.IMAGE_SIZE, **export_args)
+        if os.path.abspath(exported) != os.path.abspath(export_path):
+            os.replace(exported, export_path)
+    except Exception as e:
+        logger.warning(f"⚠️ {label} export failed: {e}")
+        return None
+    
+    return open_exported(export_path, label)
+
+
+def export_suffix(precision: str) -> str:
+    # Engines are built for a fixed batch/input profile, so those are part of the cache key
+    return f"-b{config.BATCH_SIZE}-{config.IMAGE_SIZE}-{precision}"
+
+
+def engine_path(stem: str, precision: str) -> str:
+    if config.ENGINE_PATH and precision == config.ENGINE_PRECISION:
+        return config.ENGINE_PATH
+    return stem + export_suffix(precision) + '.engine'
+
+
+def load_model(model_path: str) -> YOLO:
+    """Load YOLO, preferring a cached TensorRT engine (FP16, or INT8) on GPU
+    and an OpenVINO model on CPU-only hosts"""
+    if not model_path.endswith('.pt'):
+        return YOLO(model_path)
+    stem = os.path.splitext(model_path)[0]
+    
+    if USE_HALF and config.USE_TENSORRT:
+        precision_args = {
+            'int8': {'int8': True, 'data': config.INT8_CALIBRATION_DATA},
+            'fp16': {'half': True}
+        }
+        # An INT8 build that fails falls back to FP16
+        precisions = ['int8', 'fp16'] if config.ENGINE_PRECISION == 'int8' else ['fp16']
+        if 'int8' in precisions and not config.INT8_CALIBRATION_DATA:
+            # Calibrating on generic images would cache a poorly scaled engine
+            logger.warning("⚠️ AI_ENGINE_PRECISION=int8 needs AI_INT8_DATA (traffic calibration set); using FP16")
+            precisions = ['fp16']
+        for precision in precisions:
+            # Dynamic batch axis so one engine serves full and partial batches
+            engine = load_exported(
+                model_path, engine_path(stem, precision), f"TensorRT {precision} engine",
+                format='engine', dynamic=True, simplify=True, batch=config.BATCH_SIZE,
+                workspace=4, device=0, **precision_args[precision]
+            )
+            if engine is not None:
+                return engine
+    
+    elif not USE_HALF and config.USE_OPENVINO:
+        exported = load_exported(
+            model_path, config.OPENVINO_PATH or stem + export_suffix('fp32') + '_openvino_model', "OpenVINO model",
+            format='openvino', dynamic=True, batch=config.BATCH_SIZE
+        )
+        if exported is not None:
+            return exported
+    
+    logger.info("Using PyTorch weights")
+    return YOLO(model_path)
+
+
 try:
     logger.info(f"Loading YOLO: {config.MODEL_PATH}")
-    model = YOLO(config.MODEL_PATH)
+    model = load_model(config.MODEL_PATH)
     logger.info("✅ Model loaded")
 except:
     logger.info("⚠️ Fallback to YOLOv8n")
     model = YOLO('yolov8n.pt')
 
+# Label map as an array so a whole frame's ids resolve in one indexing op
+CLASS_NAMES = np.array([model.names[i] for i in range(len(model.names))], dtype=object)
 
-def extract_frames(video_path: str, interval: float = 0.5, max_frames: int = 500):
-    """Extract frames with 0.5 second interval"""
-    frames = []
-    cap = cv2.VideoCapture(video_path)
+# Label ids the tracker keeps, resolved once from the loaded model
+VEHICLE_CLASS_IDS = torch.tensor(
+    [cid for cid, name in model.names.items() if name in OptimizedVehicleTracker.VEHICLE_CLASSES],
+    dtype=torch.long
+)
+# Device copies of VEHICLE_CLASS_IDS, made once per device rather than per result
+_vehicle_class_ids_on = {}
+
+
+def vehicle_class_ids(device) -> torch.Tensor:
+    ids = _vehicle_class_ids_on.get(device)
+    if ids is None:
+        ids = _vehicle_class_ids_on[device] = VEHICLE_CLASS_IDS.to(device)
+    return ids
+
+
+# Single in-process model shared by all requests (uvicorn runs one worker);
+# forward passes are serialised so concurrent videos queue instead of racing
+inference_lock = threading.Lock()
+
+
+def run_model(frames, confidence_threshold: float):
+    with inference_lock:
+        return model(frames, conf=confidence_threshold, half=USE_HALF, verbose=False)
+
+
+WARMUP_FRAME = np.zeros((config.IMAGE_SIZE, config.IMAGE_SIZE, 3), dtype=np.uint8)
+
+
+async def keep_warm():
+    """Periodic dummy inference so the engine doesn't go cold between videos"""
+    while True:
+        await asyncio.sleep(config.KEEP_WARM_SECONDS)
+        # Never queue behind (or delay) real work
+        if not inference_lock.locked():
+            await asyncio.to_thread(run_model, WARMUP_FRAME, config.MODEL_CONFIDENCE)
+
+
+@app.on_event("startup")
+async def startup_event():
+    # Compile the tracker kernels now rather than on the first video
+    warmup_kernels()
+    logger.info("✅ Tracker kernels ready")
     
-    if not cap.isOpened():
-        return frames
+    # Dummy forward passes initialise CUDA/TensorRT (and let the engine settle
+    # on its kernels) before the first request
+    for _ in range(max(config.WARMUP_RUNS, 1)):
+        run_model(WARMUP_FRAME, config.MODEL_CONFIDENCE)
+    
+    # The predictor builds (and fuses) its network on the first call, so the
+    # compiled module is swapped in afterwards. Exported backends are skipped.
+    backend = getattr(model.predictor, 'model', None)
+    if config.TORCH_COMPILE and isinstance(getattr(backend, 'model', None), torch.nn.Module):
+        # dynamic=None: the first new input shape (batch-1 keep-warm passes, a
+        # partial last batch, another aspect ratio) triggers one recompile with
+        # dynamic dims instead of one per shape until dynamo's cache limit
+        # drops back to eager. CUDA graphs are still recorded per distinct shape.
+        backend.model = torch.compile(backend.model, mode='reduce-overhead', dynamic=None)
+        # Compile for the full batch, then a single frame (which takes the
+        # dynamic recompile), now rather than during the first video
+        run_model([WARMUP_FRAME] * config.BATCH_SIZE, config.MODEL_CONFIDENCE)
+        run_model(WARMUP_FRAME, config.MODEL_CONFIDENCE)
+        logger.info("✅ Model compiled with torch.compile")
+    
+    logger.info("✅ Model warmed up")
+    
+    if config.KEEP_WARM_SECONDS > 0:
+        # Keep a reference so the task isn't garbage collected
+        app.state.keep_warm = asyncio.create_task(keep_warm())
+
+
+def open_video(video_path: str) -> cv2.VideoCapture:
+    """Open a video, asking FFmpeg for hardware decoding when enabled"""
+    if config.HW_DECODE:
+        # Falls back to software decoding if no accelerator is available
+        return cv2.VideoCapture(
+            video_path, cv2.CAP_FFMPEG,
+            [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        )
+    return cv2.VideoCapture(video_path)
+
+
+def frame_scale(video_path: str, max_side: int) -> float:
+    """Resize factor that brings the video's longer side down to `max_side`"""
+    if max_side <= 0:
+        return 1.0
+    
+    cap = cv2.VideoCapture(video_path)
+    try:
+        longest = max(cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
     
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_interval = int(fps * interval) if fps > 0 else 15  # 0.5s = 15 frames at 30fps
+    return max_side / longest if longest > max_side else 1.0
+
+
+def iter_frames(video_path: str, interval: float = 0.5, max_frames: int = 500,
+                scale: float = 1.0):
+    """Yield frames at the given interval, decoding lazily"""
+    cap = open_video(video_path)
     
-    frame_count = 0
-    extracted = 0
+    if not cap.isOpened():
+        return
     
-    while extracted < max_frames:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_interval = int(fps * interval) if fps > 0 else 15  # 0.5s = 15 frames at 30fps
         
-        if frame_count % frame_interval == 0:
-            frames.append(frame)
-            extracted += 1
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if 0 < config.SEEK_MIN_FRAMES <= frame_interval and total_frames > 0 and fps > 0:
+            # Samples are further apart than a typical GOP: seeking decodes
+            # from the nearest keyframe instead of every frame in between.
+            # Targets are timestamps, so variable frame rate videos stay on time.
+            duration_ms = total_frames / fps * 1000.0
+            for target_ms in np.arange(0.0, duration_ms, interval * 1000.0)[:max_frames]:
+                cap.set(cv2.CAP_PROP_POS_MSEC, target_ms)
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield resize_frame(frame, scale)
+            return
         
-        frame_count += 1
-    
-    cap.release()
+        frame_count = 0
+        extracted = 0
+        
+        while extracted < max_frames:
+            # grab() only advances the decoder; the BGR conversion and copy
+            # in retrieve() are paid for sampled frames alone
+            if not cap.grab():
+                break
+            
+            if frame_count % frame_interval == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                yield resize_frame(frame, scale)
+                extracted += 1
+            
+            frame_count += 1
+    finally:
+        cap.release()
+
+
+def resize_frame(frame: np.ndarray, scale: float) -> np.ndarray:
+    """Downscale a frame by `scale` (area averaging); 1.0 returns it untouched"""
+    if scale == 1.0:
+        return frame
+    return cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def extract_frames(video_path: str, interval: float = 0.5, max_frames: int = 500):
+    """Extract frames with 0.5 second interval"""
+    frames = list(iter_frames(video_path, interval, max_frames))
     logger.info(f"✂️ Extracted {len(frames)} frames (interval: {interval}s)")
     return frames
 
 
-def detect_accident(frames, confidence_threshold=0.35):
+def prefetch(iterable, maxsize: int):
+    """Drive `iterable` on a background thread, keeping up to `maxsize` items ready
+    
+    cv2 decoding and YOLO inference release the GIL, so chaining stages overlaps
+    decode, inference and tracking.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+    failure = []
+    iterator = iter(iterable)
+    
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def produce():
+        try:
+            for item in iterator:
+                if not put(item):
+                    break
+        except Exception as e:
+            failure.append(e)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+            put(done)
+    
+    producer = threading.Thread(target=produce, name='prefetch', daemon=True)
+    producer.start()
+    
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                break
+            yield item
+        if failure:
+            raise failure[0]
+    finally:
+        stop.set()
+        producer.join()
+
+
+def dhash(frame: np.ndarray) -> int:
+    """64-bit difference hash of a BGR frame (9x8 grayscale thumbnail)"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    thumb = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(thumb[:, 1:] > thumb[:, :-1]).tobytes(), 'big')
+
+
+def result_detections(result, confidence_threshold: float, box_scale: float) -> Optional[Dict]:
+    """process_frame arguments (minus frame_idx) for one YOLO result, or None without boxes"""
+    boxes = result.boxes
+    if len(boxes) == 0:
+        return None
+    
+    # Filter on the device, then copy only the kept rows of
+    # boxes.data ([x1, y1, x2, y2, conf, cls]) in a single transfer
+    keep = (boxes.conf >= confidence_threshold) & torch.isin(
+        boxes.cls.long(), vehicle_class_ids(boxes.cls.device)
+    )
+    data = boxes.data[keep].float().cpu().numpy()
+    class_ids = data[:, 5].astype(np.int64)
+    
+    return {
+        'boxes': data[:, :4] if box_scale == 1.0 else data[:, :4] * box_scale,
+        'confidences': data[:, 4],
+        'class_ids': class_ids,
+        'class_names': CLASS_NAMES[class_ids]
+    }
+
+
+def iter_detections(frames, confidence_threshold: float, batch_size: int,
+                    box_scale: float = 1.0):
+    """Run YOLO over `frames` in batches and yield one entry per frame, in order
+    
+    Entries are process_frame keyword arguments, or None for frames without boxes.
+    Boxes are multiplied by `box_scale` to undo any downscaling of the frames.
+    With AI_DEDUPE_MAX_DISTANCE set, frames whose dHash is that close to the last
+    inferred frame skip YOLO and yield None. Repeating the old boxes would read as
+    zero velocity (a false sudden stop); a gap lets the next real detection's
+    velocity span both frames instead.
+    """
+    # `frames` may be a list or a lazy iterator (see detect_accident_in_video)
+    frame_iter = iter(frames)
+    frame_idx = 0
+    last_hash = None
+    
+    try:
+        while batch := list(islice(frame_iter, batch_size)):
+            fresh = [True] * len(batch)
+            if config.DEDUPE_MAX_DISTANCE > 0:
+                for i, frame in enumerate(batch):
+                    frame_hash = dhash(frame)
+                    distance = 64 if last_hash is None else (frame_hash ^ last_hash).bit_count()
+                    if distance <= config.DEDUPE_MAX_DISTANCE:
+                        fresh[i] = False
+                    else:
+                        last_hash = frame_hash
+            
+            # One forward pass per batch; results come back in frame order
+            to_infer = [frame for frame, is_fresh in zip(batch, fresh) if is_fresh]
+            results = iter(run_model(to_infer, confidence_threshold) if to_infer else ())
+            
+            for is_fresh in fresh:
+                entry = result_detections(next(results), confidence_threshold, box_scale) if is_fresh else None
+                yield None if entry is None else dict(entry, frame_idx=frame_idx)
+                frame_idx += 1
+    finally:
+        # Stop the upstream decoder promptly if inference fails or is abandoned
+        close = getattr(frame_iter, 'close', None)
+        if close is not None:
+            close()
+
+
+def detect_accident(frames, confidence_threshold=0.35, batch_size=None, box_scale=1.0):
     """Optimized accident detection"""
+    batch_size = batch_size or config.BATCH_SIZE
     tracker = OptimizedVehicleTracker(
         confidence_threshold=confidence_threshold,
         max_age=3,
@@ -542,26 +1057,18 @@ def detect_accident(frames, confidence_threshold=0.35):
         erratic_angle_threshold=60.0
     )
     
-    for frame_idx, frame in enumerate(frames):
-        results = model(frame, conf=confidence_threshold, verbose=False)
-        
-        for result in results:
-            boxes = result.boxes
-            if len(boxes) == 0:
-                continue
-            
-            box_coords = boxes.xyxy.cpu().numpy()
-            confidences = boxes.conf.cpu().numpy()
-            class_ids = boxes.cls.cpu().numpy()
-            class_names = [model.names[int(cid)] for cid in class_ids]
-            
-            tracker.process_frame(
-                boxes=box_coords,
-                confidences=confidences,
-                class_ids=class_ids,
-                class_names=class_names,
-                frame_idx=frame_idx
-            )
+    # Inference runs a batch ahead on its own thread while this one tracks;
+    # the tracker itself only ever sees frames from here, in order
+    detections = prefetch(
+        iter_detections(frames, confidence_threshold, batch_size, box_scale),
+        maxsize=2 * batch_size
+    )
+    total_frames = 0
+    
+    for frame_detections in detections:
+        total_frames += 1
+        if frame_detections is not None:
+            tracker.process_frame(**frame_detections)
     
     accident_result = tracker.detect_accidents()
     stats = tracker.get_statistics()
@@ -569,7 +1076,7 @@ def detect_accident(frames, confidence_threshold=0.35):
     return {
         'hasAccident': accident_result['has_accident'],
         'confidence': float(accident_result['confidence']),
-        'totalFrames': len(frames),
+        'totalFrames': total_frames,
         'confirmedTracks': stats['confirmed_tracks'],
         'suspiciousFrames': accident_result['suspicious_frames'],
         'indicatorCounts': accident_result['indicator_counts'],
@@ -577,6 +1084,20 @@ def detect_accident(frames, confidence_threshold=0.35):
     }
 
 
+def detect_accident_in_video(video_path: str, interval: float = 0.5, max_frames: int = 500,
+                             confidence_threshold: float = 0.35, batch_size=None):
+    """Decode and detect concurrently instead of extracting every frame up front"""
+    batch_size = batch_size or config.BATCH_SIZE
+    # Smaller frames in the queue; boxes are mapped back to source pixels so
+    # the tracker's distance thresholds keep their meaning
+    scale = frame_scale(video_path, config.FRAME_MAX_SIDE)
+    frames = prefetch(iter_frames(video_path, interval, max_frames, scale), maxsize=2 * batch_size)
+    return detect_accident(
+        frames, confidence_threshold=confidence_threshold, batch_size=batch_size,
+        box_scale=1.0 / scale
+    )
+
+
 @app.get("/health")
 async def health():
     return {
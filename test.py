@@ -11,11 +11,23 @@ from datetime import datetime
 import os
 import tempfile
 import re
+import sys
 
 # YOLOv8 модель ачаалах
 MODEL_PATH = 'models/yolov8n.pt'  # or your model path
+BATCH_SIZE = int(os.getenv('AI_BATCH_SIZE', 16))  # Нэг forward pass-д орох frame
+EARLY_EXIT = os.getenv('AI_EARLY_EXIT', 'false').lower() == 'true'  # Дүгнэлт тогтмогц зогсох
 model = YOLO(MODEL_PATH)
 
+# Ослын түлхүүр үгтэй класс-ууд (model.names-ээс нэг удаа тооцно)
+ACCIDENT_KEYWORDS = {
+    'car', 'truck', 'bus', 'motorcycle', 
+    'person', 'bicycle'
+}
+CLASS_NAMES = np.array([model.names[i] for i in range(len(model.names))], dtype=object)
+# Class ID бүрийн ослын шийдвэр; илрүүлэлт бүрд IS_ACCIDENT_CLASS[class_id] гэж шалгана
+IS_ACCIDENT_CLASS = np.array([name.lower() in ACCIDENT_KEYWORDS for name in CLASS_NAMES], dtype=bool)
+
 def is_youtube_url(url: str) -> bool:
     """YouTube URL эсэхийг шалгах"""
     youtube_regex = r'(https?://)?(www\.)?(youtube|youtu|youtube-nocookie)\.(com|be)/'
@@ -70,14 +82,31 @@ def extract_frames(video_path: str, interval: int = 2):
     
     print(f"📊 FPS: {fps}, Total frames: {total_frames}, Interval: {frame_interval}")
     
+    # Авах frame-үүдийн буферийг урьдчилан нөөцөлж, retrieve() шууд түүн рүү бичнэ
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    expected = total_frames // frame_interval + 1 if total_frames > 0 else 0
+    try:
+        buffer = np.empty((expected, height, width, 3), dtype=np.uint8)
+    except MemoryError:
+        # Зарим файл FRAME_COUNT-ийг хэт их гэж мэдээлдэг; буфергүйгээр уншина
+        expected = 0
+        buffer = None
+    
     frame_count = 0
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        # grab() нь frame-ийг зөвхөн алгасна; BGR хөрвүүлэлт retrieve()-д
+        if not cap.grab():
             break
         
         if frame_count % frame_interval == 0:
-            frames.append(frame)
+            # FRAME_COUNT буруу байвал буфер дүүрнэ; тэгвэл шинэ массив авна
+            if len(frames) < expected:
+                ret, frame = cap.retrieve(buffer[len(frames)])
+            else:
+                ret, frame = cap.retrieve()
+            if ret:
+                frames.append(frame)
         
         frame_count += 1
     
@@ -85,60 +114,101 @@ def extract_frames(video_path: str, interval: int = 2):
     print(f"✂️  Салгасан frame: {len(frames)} / {total_frames}")
     return frames
 
-def detect_accident(frames, confidence_threshold: float = 0.5):
-    """YOLOv8 ашиглан осол илрүүлэх"""
-    accident_keywords = [
-        'car', 'truck', 'bus', 'motorcycle', 
-        'person', 'bicycle'
-    ]
+def detect_accident(frames, confidence_threshold: float = 0.5, early_exit: bool = False):
+    """YOLOv8 ашиглан осол илрүүлэх
     
-    all_detections = []
+    early_exit=True бол дүгнэлт (hasAccident) өөрчлөгдөхгүй болмогц үлдсэн
+    frame-үүдийг алгасна; тэр үед confidence (мөн severity), detectedObjects,
+    accidentFrames нь зөвхөн боловсруулсан frame-үүдийг тооцно.
+    """
+    total_frames = len(frames)
+    # Илрүүлэлтүүдийг frame тус бүрийн массиваар (SoA) хадгалж, dict-ийг төгсгөлд нь үүсгэнэ
+    detection_frames = []
+    detection_class_ids = []
+    detection_confidences = []
+    detection_bboxes = []
     accident_frames = 0
     max_confidence = 0.0
+    # Хүснэгтийн мөрүүдийг batch бүрийн төгсгөлд нэг дор хэвлэнэ
+    log_rows = []
     
     print(f"\n🤖 AI илрүүлэлт эхэллээ...")
     print(f"{'Frame':<8} {'Object':<15} {'Confidence':<12} {'Status'}")
     print("-" * 60)
     
-    for idx, frame in enumerate(frames):
+    for batch_start in range(0, len(frames), BATCH_SIZE):
+        batch = frames[batch_start:batch_start + BATCH_SIZE]
         try:
-            results = model(frame, conf=confidence_threshold, verbose=False)
-            
-            frame_has_accident_indicators = False
-            
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    class_id = int(box.cls[0])
-                    confidence = float(box.conf[0])
-                    class_name = model.names[class_id]
-                    
-                    detection = {
-                        'frame': idx,
-                        'class': class_name,
-                        'confidence': confidence,
-                        'bbox': box.xyxy[0].tolist()
-                    }
-                    all_detections.append(detection)
-                    
-                    # Ослын түлхүүр үг шалгах
-                    if any(keyword in class_name.lower() for keyword in accident_keywords):
-                        if confidence > max_confidence:
-                            max_confidence = confidence
-                        frame_has_accident_indicators = True
-                        
-                        status = "⚠️  ACCIDENT" if confidence > 0.6 else "⚡ DETECTED"
-                        print(f"{idx:<8} {class_name:<15} {confidence:<12.2%} {status}")
-            
-            if frame_has_accident_indicators:
-                accident_frames += 1
-                
+            # Нэг batch-д нэг forward pass
+            results = model(batch, conf=confidence_threshold, verbose=False)
         except Exception as e:
-            print(f"❌ Frame {idx} алдаа: {e}")
+            print(f"❌ Frame {batch_start}-{batch_start + len(batch) - 1} алдаа: {e}")
             continue
+        
+        for idx, result in enumerate(results, start=batch_start):
+            try:
+                boxes = result.boxes
+                if len(boxes) == 0:
+                    continue
+                
+                # Бүх box-ыг нэг дор CPU руу хуулах
+                class_ids = boxes.cls.cpu().numpy().astype(int)
+                confidences = boxes.conf.cpu().numpy()
+                bboxes = boxes.xyxy.cpu().numpy()
+                class_names = CLASS_NAMES[class_ids]
+                
+                detection_frames.append(np.full(len(class_ids), idx))
+                detection_class_ids.append(class_ids)
+                detection_confidences.append(confidences)
+                detection_bboxes.append(bboxes)
+                
+                # Ослын түлхүүр үг шалгах
+                accident_mask = IS_ACCIDENT_CLASS[class_ids]
+                if accident_mask.any():
+                    max_confidence = max(max_confidence, float(confidences[accident_mask].max()))
+                    accident_frames += 1
+                    log_rows.append((idx, class_names[accident_mask], confidences[accident_mask]))
+                    
+            except Exception as e:
+                print(f"❌ Frame {idx} алдаа: {e}")
+                continue
+        
+        if log_rows:
+            sys.stdout.write(''.join(
+                f"{idx:<8} {name:<15} {confidence:<12.2%} "
+                f"{'⚠️  ACCIDENT' if confidence > 0.6 else '⚡ DETECTED'}\n"
+                for idx, names, confs in log_rows
+                for name, confidence in zip(names, confs.tolist())
+            ))
+            log_rows.clear()
+        
+        if early_exit:
+            # accident_frames, max_confidence хоёр зөвхөн өсдөг тул дүгнэлт тогтсон эсэхийг шалгана
+            remaining = total_frames - (batch_start + len(batch))
+            accident_locked = max_confidence > 0.6 and accident_frames / total_frames > 0.3
+            no_accident_locked = (accident_frames + remaining) / total_frames <= 0.3
+            if remaining > 0 and (accident_locked or no_accident_locked):
+                print(f"⏩ Дүгнэлт тогтсон тул үлдсэн {remaining} frame-ийг алгаслаа")
+                break
+    
+    all_detections = []
+    if detection_frames:
+        all_detections = [
+            {
+                'frame': frame_idx,
+                'class': class_name,
+                'confidence': confidence,
+                'bbox': bbox
+            }
+            for frame_idx, class_name, confidence, bbox in zip(
+                np.concatenate(detection_frames).tolist(),
+                CLASS_NAMES[np.concatenate(detection_class_ids)].tolist(),
+                np.concatenate(detection_confidences).tolist(),
+                np.concatenate(detection_bboxes).tolist()
+            )
+        ]
     
     # Үр дүн тооцоолох
-    total_frames = len(frames)
     accident_ratio = (accident_frames / total_frames) if total_frames > 0 else 0
     has_accident = accident_ratio > 0.3 and max_confidence > 0.6
     
@@ -168,7 +238,7 @@ def detect_accident(frames, confidence_threshold: float = 0.5):
         'accidentRatio': accident_ratio
     }
 
-def test_video(video_path: str, output_json: str = None):
+def test_video(video_path: str, output_json: str = None, early_exit: bool = EARLY_EXIT):
     """Видео тест хийх (локал файл эсвэл YouTube URL)"""
     print("=" * 60)
     print("🎬 AI DETECTION SERVICE - LOCAL TEST")
@@ -212,7 +282,7 @@ def test_video(video_path: str, output_json: str = None):
         return None
     
     # 2. AI илрүүлэлт
-    result = detect_accident(frames, confidence_threshold=0.5)
+    result = detect_accident(frames, confidence_threshold=0.5, early_exit=early_exit)
     
     # 3. Үр дүнг хадгалах
     if output_json:
@@ -251,6 +321,7 @@ if __name__ == "__main__":
     print("2. Локал файл:        python test_ai_service.py video.mp4")
     print("3. YouTube URL:       python test_ai_service.py https://youtube.com/watch?v=...")
     print("4. Үр дүн хадгалах:   python test_ai_service.py video.mp4 result.json")
+    print("5. Эрт зогсох:        AI_EARLY_EXIT=true python test_ai_service.py video.mp4")
     print("-" * 60 + "\n")
     
     result = test_video(video_path, output_json)